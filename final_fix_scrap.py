@@ -7,12 +7,14 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import pandas as pd
 import time
+import re
 from datetime import datetime, timedelta
 import sys
 import io
 import os
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 import pytz
 import logging
 from typing import List, Dict, Any
@@ -377,34 +379,35 @@ def extract_manual_complete(driver):
         logger.error(f"Robust extraction error: {e}")
         return []
 
+# Separators, symbols and currency markers removed from numeric cells in one pass
+_NUMERIC_STRIP_PATTERN = re.compile(r'Rs\.?|PKR|--|[, %()$—]')
+_NUMERIC_SENTINELS = frozenset({'', '-', '--', '---', 'N/A', 'NAN', 'NULL', 'N.S.', 'N/S', 'n/s'})
+
 def clean_numeric_value(value):
     """Clean and convert numeric values properly"""
-    if not value or value in ['N/A', '-', '', ' ', 'NAN', 'NULL', 'N.S.', 'N/S', 'n/s']:
+    if not value:
+        return '0'
+    
+    cleaned = str(value).strip()
+    if cleaned in _NUMERIC_SENTINELS:
+        return '0'
+    
+    cleaned = _NUMERIC_STRIP_PATTERN.sub('', cleaned)
+    
+    # If it's empty after cleaning, return 0
+    if not cleaned or cleaned == '-':
         return '0'
     
     try:
-        # Remove commas, spaces, percentage signs, and other non-numeric characters except decimal point and minus
-        cleaned = str(value).strip()
-        cleaned = cleaned.replace(',', '').replace(' ', '').replace('%', '')
-        cleaned = cleaned.replace('(', '').replace(')', '').replace('$', '')
-        cleaned = cleaned.replace('Rs.', '').replace('PKR', '').replace('Rs', '')
-        cleaned = cleaned.replace('--', '').replace('---', '').replace('—', '')
-        
-        # Handle negative values properly
-        if cleaned.startswith('-'):
-            cleaned = '-' + cleaned[1:].lstrip()
-        
-        # If it's empty after cleaning, return 0
-        if not cleaned or cleaned == '-':
-            return '0'
-            
         # Convert to float and back to string to validate
-        float_val = float(cleaned)
-        return str(float_val)
-        
-    except:
+        return str(float(cleaned))
+    except ValueError:
         return '0'
 
+def to_float(value):
+    """Clean a scraped cell and convert it to float"""
+    return float(clean_numeric_value(value))
+
 def validate_stock_data(stock):
     """Validate if stock data looks reasonable"""
     try:
@@ -413,7 +416,7 @@ def validate_stock_data(stock):
             return False
         
         # Check if numeric values are reasonable
-        current_price = float(clean_numeric_value(stock['current']))
+        current_price = to_float(stock['current'])
         if current_price <= 0 or current_price > 100000:  # Assuming no stock price > 100,000
             return False
             
@@ -421,6 +424,9 @@ def validate_stock_data(stock):
     except:
         return False
 
+# Scraped price fields, in psx_stock_data insert order
+PRICE_FIELDS = ('ldcp', 'open', 'high', 'low', 'current', 'change', 'change_percent')
+
 def save_to_supabase(stocks_data: List[Dict[str, Any]], scrape_timestamp: datetime):
     """Save data to Supabase PostgreSQL database"""
     if not stocks_data:
@@ -441,7 +447,7 @@ def save_to_supabase(stocks_data: List[Dict[str, Any]], scrape_timestamp: dateti
         INSERT INTO psx_stock_data 
         (scrape_timestamp, symbol, sector, listed_in, ldcp, open_price, high_price, low_price, 
          current_price, price_change, change_percent, volume)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        VALUES %s
         ON CONFLICT (scrape_timestamp, symbol) DO NOTHING
         """
         
@@ -452,32 +458,10 @@ def save_to_supabase(stocks_data: List[Dict[str, Any]], scrape_timestamp: dateti
             if validate_stock_data(item):
                 try:
                     # Clean and convert all values
-                    ldcp = float(clean_numeric_value(item['ldcp']))
-                    open_price = float(clean_numeric_value(item['open']))
-                    high_price = float(clean_numeric_value(item['high']))
-                    low_price = float(clean_numeric_value(item['low']))
-                    current_price = float(clean_numeric_value(item['current']))
-                    price_change = float(clean_numeric_value(item['change']))
-                    change_percent = float(clean_numeric_value(item['change_percent']))
-                    
-                    # Convert volume to integer
-                    volume_cleaned = clean_numeric_value(item['volume'])
-                    volume = int(float(volume_cleaned)) if volume_cleaned != '0' else 0
+                    prices = [to_float(item[field]) for field in PRICE_FIELDS]
+                    volume = int(to_float(item['volume']))
                     
-                    row_data = (
-                        scrape_timestamp,           # scrape_timestamp
-                        item['symbol'],             # symbol
-                        item['sector'],             # sector
-                        item['listed_in'],          # listed_in
-                        ldcp,                       # ldcp
-                        open_price,                 # open_price
-                        high_price,                 # high_price
-                        low_price,                  # low_price
-                        current_price,              # current_price
-                        price_change,               # price_change
-                        change_percent,             # change_percent
-                        volume                      # volume
-                    )
+                    row_data = (scrape_timestamp, item['symbol'], item['sector'], item['listed_in'], *prices, volume)
                     
                     batch_data.append(row_data)
                     
@@ -487,7 +471,8 @@ def save_to_supabase(stocks_data: List[Dict[str, Any]], scrape_timestamp: dateti
         
         # Execute batch insert
         if batch_data:
-            cur.executemany(insert_query, batch_data)
+            # One parsed/planned statement per page instead of one per row
+            execute_values(cur, insert_query, batch_data, page_size=500)
             conn.commit()
             saved_count = len(batch_data)
             
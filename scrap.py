@@ -4,20 +4,26 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 import pandas as pd
+import requests
+import lxml.html
 import time
+import re
 from datetime import datetime, timedelta
 import sys
 import io
 import os
 import psycopg2
-from psycopg2 import sql
+from psycopg2 import sql, pool
+from psycopg2.extensions import QueryCanceledError
 import pytz
 import logging
 from typing import List, Dict, Any
 import schedule
 import threading
+import queue
 
 # Set up logging
 logging.basicConfig(
@@ -29,11 +35,28 @@ logger = logging.getLogger(__name__)
 # Fix Unicode encoding
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+# Decode WebDriver responses (execute_script results) with orjson when available
+try:
+    import orjson
+    from selenium.webdriver.remote import utils as webdriver_utils
+    webdriver_utils.load_json = orjson.loads
+except ImportError:
+    pass
+
 # Configuration
 PSX_MARKET_OPEN = "09:30"  # PKT (Asia/Karachi)
 PSX_MARKET_CLOSE = "15:30"  # PKT (Asia/Karachi)
 SCRAPE_INTERVAL_MINUTES = 5  # Run every 5 minutes during market hours
+DRIVER_RECYCLE_SCRAPES = 50  # Restart the browser after this many scrapes
+PAGE_LOAD_TIMEOUT_SECONDS = 15  # Give up on driver.get() after this long
+MIN_TABLE_ROWS = 50  # Rows expected once the market-watch table is populated
+SHUTDOWN_DRAIN_SECONDS = 30  # Max time to wait for pending database writes on exit
 PAKISTAN_TIMEZONE = pytz.timezone('Asia/Karachi')
+PSX_MARKET_WATCH_URL = "https://dps.psx.com.pk/market-watch"
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml',
+}
 
 # Database configuration
 DB_CONFIG = {
@@ -41,13 +64,37 @@ DB_CONFIG = {
     'user': os.getenv('PGUSER', 'postgres'),
     'password': os.getenv('PGPASSWORD', ''),
     'host': os.getenv('PGHOST', 'localhost'),
-    'port': os.getenv('PGPORT', '5432')
+    'port': os.getenv('PGPORT', '5432'),
+    # Keep pooled connections alive through the idle gap between scrapes
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    # Fail hung statements instead of blocking the writer thread indefinitely
+    'options': '-c statement_timeout=60000'
 }
 
+# Shared connection pool, created once per process
+PG_POOL = None
+
+def get_db_pool():
+    """Return the shared connection pool, creating it on first use"""
+    global PG_POOL
+    if PG_POOL is None:
+        PG_POOL = pool.ThreadedConnectionPool(1, 4, **DB_CONFIG)
+        logger.info("Database connection pool created")
+    return PG_POOL
+
+# Set once the schema has been verified in this process
+_DB_READY = False
+
 def setup_database():
     """Create database table if it doesn't exist"""
+    global _DB_READY
+    if _DB_READY:
+        return
+    
+    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_db_pool().getconn()
         cur = conn.cursor()
         
         create_table_query = """
@@ -72,17 +119,34 @@ def setup_database():
         CREATE INDEX IF NOT EXISTS idx_psx_data_timestamp ON psx_data(scrape_timestamp);
         CREATE INDEX IF NOT EXISTS idx_psx_data_symbol ON psx_data(symbol);
         CREATE INDEX IF NOT EXISTS idx_psx_data_sector ON psx_data(sector);
+        
+        -- Unindexed, WAL-free load area for COPY before merging into psx_data
+        CREATE UNLOGGED TABLE IF NOT EXISTS psx_stage AS
+        SELECT scrape_timestamp, symbol, sector, listed_in, ldcp, open, high, low, current, change, change_percent, volume
+        FROM psx_data WITH NO DATA;
         """
         
         cur.execute(create_table_query)
         conn.commit()
         cur.close()
-        conn.close()
+        _DB_READY = True
         logger.info("Database table setup completed")
         
     except Exception as e:
         logger.error(f"Database setup error: {e}")
         raise
+        
+    finally:
+        if conn:
+            PG_POOL.putconn(conn, close=bool(conn.closed))
+
+def get_chromedriver_path():
+    """Resolve the chromedriver path once; set CHROMEDRIVER_PATH to skip the lookup"""
+    path = os.getenv('CHROMEDRIVER_PATH')
+    if not path or not os.path.exists(path):
+        path = ChromeDriverManager().install()
+        os.environ['CHROMEDRIVER_PATH'] = path
+    return path
 
 def setup_driver():
     """Chrome driver setup - Optimized for cloud deployment"""
@@ -105,6 +169,9 @@ def setup_driver():
     chrome_options.add_argument('--blink-settings=imagesEnabled=false')
     chrome_options.add_argument('--disable-javascript')
     
+    # Return from driver.get() at DOMContentLoaded; the explicit table wait gates extraction
+    chrome_options.page_load_strategy = 'eager'
+    
     chrome_options.add_experimental_option("prefs", {
         "profile.default_content_setting_values.notifications": 2,
         "profile.default_content_setting_values.images": 2,
@@ -116,8 +183,9 @@ def setup_driver():
     chrome_options.binary_location = os.getenv('CHROME_BIN', '/usr/bin/chromium')
     
     try:
-        service = Service(ChromeDriverManager().install())
+        service = Service(get_chromedriver_path())
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT_SECONDS)
         logger.info("Chrome driver ready!")
         return driver
     except Exception as e:
@@ -125,16 +193,51 @@ def setup_driver():
         # Fallback to direct path
         try:
             driver = webdriver.Chrome(options=chrome_options)
+            driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT_SECONDS)
             logger.info("Chrome driver ready (fallback)!")
             return driver
         except Exception as e2:
             logger.error(f"Fallback also failed: {e2}")
             raise
 
+# Browser reused across scrape cycles
+_DRIVER = None
+_DRIVER_SCRAPES = 0
+
+def get_driver():
+    """Return the shared Chrome driver, recycling it periodically"""
+    global _DRIVER, _DRIVER_SCRAPES
+    if _DRIVER is not None and _DRIVER_SCRAPES >= DRIVER_RECYCLE_SCRAPES:
+        logger.info(f"Recycling browser after {_DRIVER_SCRAPES} scrapes")
+        close_driver()
+    if _DRIVER is not None:
+        # Replace a browser whose session has died since the last scrape
+        try:
+            _DRIVER.current_url
+        except WebDriverException as e:
+            logger.warning(f"Browser session lost ({e}), starting a new one...")
+            close_driver()
+    if _DRIVER is None:
+        _DRIVER = setup_driver()
+        _DRIVER_SCRAPES = 0
+    _DRIVER_SCRAPES += 1
+    return _DRIVER
+
+def close_driver():
+    """Quit the shared Chrome driver if it is running"""
+    global _DRIVER
+    if _DRIVER is not None:
+        try:
+            _DRIVER.quit()
+            logger.info("Browser closed")
+        except Exception:
+            pass
+        _DRIVER = None
+
 def extract_correct_psx_data(driver):
     """Extract PSX data with all columns"""
     try:
-        url = "https://dps.psx.com.pk/market-watch"
+        url = PSX_MARKET_WATCH_URL
         logger.info(f"Loading: {url}")
         
         driver.get(url)
@@ -146,19 +249,24 @@ def extract_correct_psx_data(driver):
         wait.until(EC.presence_of_element_located((By.TAG_NAME, "table")))
         logger.info("Table found, extracting data...")
         
-        # Give page extra time to render
-        time.sleep(2)
+        # Wait until the table body is populated rather than sleeping a fixed time
+        try:
+            wait.until(lambda d: d.execute_script(
+                "return document.querySelectorAll('table tbody tr').length"
+            ) >= MIN_TABLE_ROWS)
+        except TimeoutException:
+            logger.warning(f"Fewer than {MIN_TABLE_ROWS} rows rendered, extracting what is available...")
         
         # Extract with JavaScript
+        # Return raw cell text as a list of lists; textContent avoids a layout pass per cell
         extract_script = """
-            let allStocks = [];
             let tables = document.querySelectorAll('table');
             let targetTable = null;
             
             for (let table of tables) {
                 let headers = table.querySelectorAll('th');
                 if (headers.length >= 10) {
-                    let headerText = Array.from(headers).map(h => h.innerText.trim()).join(' ');
+                    let headerText = Array.from(headers, h => h.textContent.trim()).join(' ');
                     if (headerText.includes('Symbol') || headerText.includes('Sector') || headerText.includes('LDCP')) {
                         targetTable = table;
                         break;
@@ -170,111 +278,134 @@ def extract_correct_psx_data(driver):
                 targetTable = tables[0];
             }
             
-            if (!targetTable) return allStocks;
-            
-            let tbody = targetTable.querySelector('tbody');
-            if (!tbody) return allStocks;
-            
-            let rows = tbody.querySelectorAll('tr');
-            
-            rows.forEach((row, rowIndex) => {
-                let cells = row.querySelectorAll('td');
-                
-                if (cells.length >= 9) {
-                    let symbol = cells[0]?.innerText.trim() || '';
-                    
-                    if (!symbol || symbol === '' || symbol.length > 20 || 
-                        symbol.includes('Symbol') || symbol.includes('Last') ||
-                        symbol === 'PSX' || symbol === 'KSE-100' ||
-                        symbol.includes('Open') || symbol.includes('High') ||
-                        symbol.includes('Low') || symbol.includes('Volume')) {
-                        return;
-                    }
-                    
-                    let stockData = {
-                        symbol: symbol,
-                        sector: cells[1]?.innerText.trim() || '',
-                        listed_in: cells[2]?.innerText.trim() || '',
-                        ldcp: cells[3]?.innerText.trim() || '0',
-                        open: cells[4]?.innerText.trim() || '0',
-                        high: cells[5]?.innerText.trim() || '0',
-                        low: cells[6]?.innerText.trim() || '0',
-                        current: cells[7]?.innerText.trim() || '0',
-                        change: cells[8]?.innerText.trim() || '0',
-                        change_percent: cells[9]?.innerText.trim() || '0',
-                        volume: cells[10]?.innerText.trim() || '0'
-                    };
-                    
-                    allStocks.push(stockData);
-                }
-            });
+            if (!targetTable || !targetTable.tBodies.length) return [];
             
-            return allStocks;
+            return Array.from(targetTable.tBodies[0].rows).map(
+                r => Array.from(r.cells, c => c.textContent.trim())
+            );
         """
         
-        raw_data = driver.execute_script(extract_script)
+        raw_rows = driver.execute_script(extract_script)
+        stocks_data = parse_table_rows(raw_rows or [])
         
-        if not raw_data or len(raw_data) == 0:
+        if not stocks_data:
             logger.warning("JavaScript extraction failed, trying manual extraction...")
             return extract_manual_complete(driver)
         
-        logger.info(f"Extracted {len(raw_data)} stocks successfully")
-        return raw_data
+        logger.info(f"Extracted {len(stocks_data)} stocks successfully")
+        return stocks_data
         
     except Exception as e:
         logger.error(f"Error in main extraction: {e}")
         return extract_manual_complete(driver)
 
+# Header, summary and index rows that show up in the symbol column
+INVALID_SYMBOL_PATTERN = re.compile(r'Symbol|Last|Open|High|Low|Current|Change|Volume|PSX|KSE')
+
+def parse_table_rows(rows):
+    """Turn market-watch rows (lists of cell strings) into stock dicts"""
+    stocks_data = []
+    
+    for cells in rows:
+        if len(cells) < 9:
+            continue
+        
+        symbol = cells[0]
+        
+        if not symbol or len(symbol) > 20 or INVALID_SYMBOL_PATTERN.search(symbol):
+            continue
+        
+        stock = {
+            'symbol': symbol,
+            'sector': cells[1],
+            'listed_in': cells[2],
+            'ldcp': cells[3],
+            'open': cells[4],
+            'high': cells[5],
+            'low': cells[6],
+            'current': cells[7],
+            'change': cells[8],
+            'change_percent': cells[9] if len(cells) > 9 else '0',
+            'volume': cells[10] if len(cells) > 10 else '0'
+        }
+        
+        stocks_data.append(stock)
+        
+        if len(stocks_data) % 50 == 0:
+            logger.info(f"   {len(stocks_data)} valid stocks processed...")
+    
+    return stocks_data
+
+# HTTP session reused across scrapes for connection keep-alive
+_HTTP_SESSION = None
+
+def fetch_via_http():
+    """Fetch the market-watch table with a plain HTTP request (no browser)"""
+    global _HTTP_SESSION
+    try:
+        if _HTTP_SESSION is None:
+            _HTTP_SESSION = requests.Session()
+            _HTTP_SESSION.headers.update(HTTP_HEADERS)
+        
+        logger.info(f"Fetching over HTTP: {PSX_MARKET_WATCH_URL}")
+        response = _HTTP_SESSION.get(PSX_MARKET_WATCH_URL, timeout=10)
+        response.raise_for_status()
+        
+        doc = lxml.html.fromstring(response.text)
+        
+        # Same header test as the browser extractor picks the market-watch table
+        target_table = None
+        for table in doc.xpath('//table'):
+            headers = table.xpath('.//th')
+            if len(headers) >= 10:
+                header_text = ' '.join(h.text_content().strip() for h in headers)
+                if 'Symbol' in header_text or 'Sector' in header_text or 'LDCP' in header_text:
+                    target_table = table
+                    break
+        
+        if target_table is None:
+            logger.warning("Market-watch table not found in HTTP response")
+            return []
+        
+        # Served HTML may have no <tbody>, so take any row with data cells
+        rows = [
+            [td.text_content().strip() for td in row.xpath('./td')]
+            for row in target_table.xpath('.//tr[td]')
+        ]
+        
+        stocks_data = parse_table_rows(rows)
+        logger.info(f"HTTP extraction: {len(stocks_data)} valid stocks")
+        return stocks_data
+        
+    except Exception as e:
+        logger.error(f"HTTP extraction error: {e}")
+        return []
+
 def extract_manual_complete(driver):
     """Robust manual extraction"""
     logger.info("Using robust manual extraction...")
     
     try:
-        stocks_data = []
-        
         wait = WebDriverWait(driver, 25)
         table = wait.until(EC.presence_of_element_located((By.TAG_NAME, "table")))
-        rows = table.find_elements(By.TAG_NAME, "tr")
+        
+        # Read every cell's text in one round-trip instead of one per element
+        try:
+            rows = driver.execute_script("""
+                return Array.from(arguments[0].querySelectorAll('tr')).map(
+                    r => Array.from(r.querySelectorAll('td'), c => c.textContent.trim())
+                );
+            """, table)
+        except WebDriverException as e:
+            logger.warning(f"JavaScript row dump failed ({e}), reading cells one by one...")
+            rows = [
+                [cell.text.strip() for cell in row.find_elements(By.TAG_NAME, "td")]
+                for row in table.find_elements(By.TAG_NAME, "tr")
+            ]
         
         logger.info(f"Found {len(rows)} total rows")
         
-        processed_count = 0
-        for row in rows:
-            try:
-                cells = row.find_elements(By.TAG_NAME, "td")
-                
-                if len(cells) < 9:
-                    continue
-                
-                symbol = cells[0].text.strip()
-                
-                if (not symbol or len(symbol) > 20 or 
-                    any(keyword in symbol for keyword in ['Symbol', 'Last', 'Open', 'High', 'Low', 'Current', 'Change', 'Volume']) or
-                    'PSX' in symbol or 'KSE' in symbol):
-                    continue
-                
-                stock = {
-                    'symbol': symbol,
-                    'sector': cells[1].text.strip() if len(cells) > 1 else '',
-                    'listed_in': cells[2].text.strip() if len(cells) > 2 else '',
-                    'ldcp': cells[3].text.strip() if len(cells) > 3 else '0',
-                    'open': cells[4].text.strip() if len(cells) > 4 else '0',
-                    'high': cells[5].text.strip() if len(cells) > 5 else '0',
-                    'low': cells[6].text.strip() if len(cells) > 6 else '0',
-                    'current': cells[7].text.strip() if len(cells) > 7 else '0',
-                    'change': cells[8].text.strip() if len(cells) > 8 else '0',
-                    'change_percent': cells[9].text.strip() if len(cells) > 9 else '0',
-                    'volume': cells[10].text.strip() if len(cells) > 10 else '0'
-                }
-                
-                stocks_data.append(stock)
-                processed_count += 1
-                
-                if processed_count % 50 == 0:
-                    logger.info(f"   {processed_count} valid stocks processed...")
-                
-            except Exception:
-                continue
+        stocks_data = parse_table_rows(rows)
         
         logger.info(f"Robust extraction: {len(stocks_data)} valid stocks")
         return stocks_data
@@ -283,44 +414,38 @@ def extract_manual_complete(driver):
         logger.error(f"Robust extraction error: {e}")
         return []
 
-def clean_numeric_value(value):
-    """Clean and convert numeric values"""
-    if not value or value in ['N/A', '-', '', ' ', 'NAN', 'NULL', 'N/S', 'N.S', 'n/s']:
-        return '0'
-    
-    try:
-        cleaned = str(value).strip()
-        cleaned = cleaned.replace(',', '').replace(' ', '').replace('%', '')
-        cleaned = cleaned.replace('(', '').replace(')', '').replace('$', '')
-        cleaned = cleaned.replace('Rs.', '').replace('PKR', '').replace('\u20a8', '')  # Rupee symbol
-        cleaned = cleaned.replace('--', '0').replace('---', '0')
-        
-        # Handle negative values
-        if cleaned.startswith('-'):
-            cleaned = '-' + cleaned[1:].lstrip()
-        
-        if not cleaned or cleaned == '-':
-            return '0'
-            
-        float_val = float(cleaned)
-        return str(float_val)
-        
-    except Exception:
-        return '0'
+# Stock columns in database insert order
+STOCK_TEXT_COLUMNS = ['symbol', 'sector', 'listed_in']
+STOCK_NUMERIC_COLUMNS = ['ldcp', 'open', 'high', 'low', 'current', 'change', 'change_percent', 'volume']
+PSX_DATA_COLUMNS = ', '.join(['scrape_timestamp'] + STOCK_TEXT_COLUMNS + STOCK_NUMERIC_COLUMNS)
 
-def validate_stock_data(stock):
-    """Validate stock data"""
-    try:
-        if not stock['symbol'] or len(stock['symbol']) > 20:
-            return False
-        
-        current_price = float(clean_numeric_value(stock['current']))
-        if current_price <= 0 or current_price > 100000:
-            return False
-            
-        return True
-    except Exception:
-        return False
+# Separators, currency markers and brackets stripped from numeric cells
+NUMERIC_STRIP_PATTERN = re.compile(r'[,\s%()$\u20a8]|Rs\.|PKR')
+
+def clean_stock_frame(stocks_data: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Clean numeric columns and drop invalid stocks in one vectorized pass"""
+    df = pd.DataFrame(stocks_data, columns=STOCK_TEXT_COLUMNS + STOCK_NUMERIC_COLUMNS)
+    df[STOCK_TEXT_COLUMNS] = df[STOCK_TEXT_COLUMNS].fillna('')
+    
+    # Placeholders such as 'N/A' or '--' fail to parse and become 0
+    df[STOCK_NUMERIC_COLUMNS] = (
+        df[STOCK_NUMERIC_COLUMNS]
+        .astype(str)
+        .replace(NUMERIC_STRIP_PATTERN, '', regex=True)
+        .apply(pd.to_numeric, errors='coerce')
+        .fillna(0)
+    )
+    
+    # Keep stocks with a sane symbol and current price
+    valid = (
+        df['symbol'].str.len().between(1, 20)
+        & (df['current'] > 0)
+        & (df['current'] <= 100000)
+    )
+    df = df[valid].copy()
+    df['volume'] = df['volume'].astype('int64')
+    
+    return df
 
 def save_to_postgresql(stocks_data: List[Dict[str, Any]], scrape_timestamp: datetime):
     """Save data to PostgreSQL database"""
@@ -328,48 +453,67 @@ def save_to_postgresql(stocks_data: List[Dict[str, Any]], scrape_timestamp: date
         logger.warning("No data to save")
         return False
     
+    # A pooled connection may have been dropped while idle; retry once on a fresh one
+    for attempt in range(2):
+        try:
+            return _write_batch(stocks_data, scrape_timestamp)
+        except QueryCanceledError as e:
+            # Statement timeout on a healthy connection; rerunning would just time out again
+            logger.error(f"Database statement timed out: {e}")
+            break
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if attempt == 0:
+                logger.warning(f"Database connection error ({e}), retrying with a fresh connection...")
+                continue
+            logger.error(f"Database error: {e}")
+        except Exception as e:
+            logger.error(f"Database error: {e}")
+            break
+    
+    return False
+
+def _write_batch(stocks_data: List[Dict[str, Any]], scrape_timestamp: datetime):
+    """Load one scrape batch into psx_data; raises on database errors"""
     conn = None
     cur = None
     saved_count = 0
+    broken = False
     
     try:
-        # Connect to database
-        conn = psycopg2.connect(**DB_CONFIG)
+        # Make sure the schema exists (no-op after the first successful call)
+        setup_database()
+        
+        # Borrow a connection from the pool
+        conn = get_db_pool().getconn()
         cur = conn.cursor()
         
-        # Prepare insert query
-        insert_query = """
-        INSERT INTO psx_data 
-        (scrape_timestamp, symbol, sector, listed_in, ldcp, open, high, low, current, change, change_percent, volume)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (scrape_timestamp, symbol) DO NOTHING
-        """
+        # Don't wait for the WAL flush on commit. A server crash can lose the
+        # last few committed snapshots, which is acceptable for this log.
+        cur.execute("SET LOCAL synchronous_commit = off")
+        
+        # Clean and validate all stocks at once
+        df = clean_stock_frame(stocks_data)
         
-        # Process and insert each stock
-        for item in stocks_data:
-            if validate_stock_data(item):
-                try:
-                    row_data = (
-                        scrape_timestamp,
-                        item['symbol'],
-                        item['sector'],
-                        item['listed_in'],
-                        float(clean_numeric_value(item['ldcp'])) if clean_numeric_value(item['ldcp']) != '0' else 0,
-                        float(clean_numeric_value(item['open'])) if clean_numeric_value(item['open']) != '0' else 0,
-                        float(clean_numeric_value(item['high'])) if clean_numeric_value(item['high']) != '0' else 0,
-                        float(clean_numeric_value(item['low'])) if clean_numeric_value(item['low']) != '0' else 0,
-                        float(clean_numeric_value(item['current'])) if clean_numeric_value(item['current']) != '0' else 0,
-                        float(clean_numeric_value(item['change'])) if clean_numeric_value(item['change']) != '0' else 0,
-                        float(clean_numeric_value(item['change_percent'])) if clean_numeric_value(item['change_percent']) != '0' else 0,
-                        int(float(clean_numeric_value(item['volume']))) if clean_numeric_value(item['volume']) != '0' else 0
-                    )
-                    
-                    cur.execute(insert_query, row_data)
-                    saved_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing stock {item.get('symbol', 'unknown')}: {e}")
-                    continue
+        if not df.empty:
+            # Serialize the batch as CSV for COPY
+            df.insert(0, 'scrape_timestamp', scrape_timestamp.isoformat())
+            buf = io.StringIO()
+            df.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            
+            # COPY has no ON CONFLICT, so load the staging table and merge from it
+            cur.execute("TRUNCATE psx_stage")
+            cur.copy_expert(
+                f"COPY psx_stage ({PSX_DATA_COLUMNS}) FROM STDIN "
+                "WITH (FORMAT csv, FORCE_NOT_NULL (sector, listed_in))",
+                buf
+            )
+            cur.execute(f"""
+            INSERT INTO psx_data ({PSX_DATA_COLUMNS})
+            SELECT DISTINCT ON (scrape_timestamp, symbol) {PSX_DATA_COLUMNS} FROM psx_stage
+            ON CONFLICT (scrape_timestamp, symbol) DO NOTHING
+            """)
+            saved_count = cur.rowcount
         
         conn.commit()
         logger.info(f"Saved {saved_count} stocks to database at {scrape_timestamp}")
@@ -396,16 +540,19 @@ def save_to_postgresql(stocks_data: List[Dict[str, Any]], scrape_timestamp: date
         return True
         
     except Exception as e:
-        logger.error(f"Database error: {e}")
-        if conn:
+        broken = (isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+                  and not isinstance(e, QueryCanceledError))
+        # Rolling back a dropped connection would raise and hide the real error
+        if conn and not conn.closed:
             conn.rollback()
-        return False
+        raise
         
     finally:
-        if cur:
+        if cur and not cur.closed:
             cur.close()
         if conn:
-            conn.close()
+            # Drop broken connections instead of returning them to the pool
+            PG_POOL.putconn(conn, close=broken or bool(conn.closed))
 
 def is_market_open() -> bool:
     """Check if current time is within PSX market hours"""
@@ -446,50 +593,107 @@ def get_next_scrape_time() -> datetime:
     
     return next_time
 
+# Scraped batches waiting to be written, consumed by the writer thread
+DB_WRITE_QUEUE = queue.Queue(maxsize=4)
+_DB_WRITER = None
+
+def db_writer():
+    """Save queued scrape batches to PostgreSQL in the background"""
+    while True:
+        stocks_data, scrape_timestamp = DB_WRITE_QUEUE.get()
+        try:
+            success = save_to_postgresql(stocks_data, scrape_timestamp)
+            
+            if success:
+                logger.info(f"✓ Scrape completed successfully at {scrape_timestamp}")
+                
+                # Display sample data
+                logger.info("Sample data (first 3 stocks):")
+                for i in range(min(3, len(stocks_data))):
+                    stock = stocks_data[i]
+                    logger.info(f"  {stock['symbol']}: {stock['current']} ({stock['change_percent']}%)")
+            else:
+                logger.error("Failed to save data to database")
+                
+        except Exception as e:
+            logger.error(f"Database writer error: {e}")
+            
+        finally:
+            DB_WRITE_QUEUE.task_done()
+
+def start_db_writer():
+    """Start the background database writer thread if it is not running"""
+    global _DB_WRITER
+    if _DB_WRITER is None:
+        _DB_WRITER = threading.Thread(target=db_writer, name="db-writer", daemon=True)
+        _DB_WRITER.start()
+
+def drain_db_writer(timeout: float = SHUTDOWN_DRAIN_SECONDS) -> bool:
+    """Wait a bounded time for queued batches to be written; True if all finished"""
+    with DB_WRITE_QUEUE.all_tasks_done:
+        drained = DB_WRITE_QUEUE.all_tasks_done.wait_for(
+            lambda: not DB_WRITE_QUEUE.unfinished_tasks, timeout
+        )
+        pending = DB_WRITE_QUEUE.unfinished_tasks
+    
+    if not drained:
+        logger.warning(f"Gave up waiting on {pending} unsaved batch(es) after {timeout:.0f} seconds")
+    return drained
+
+def get_next_market_open() -> datetime:
+    """Calculate the next market open time (today if before open, else next weekday)"""
+    now_pk = datetime.now(PAKISTAN_TIMEZONE)
+    open_hour, open_minute = map(int, PSX_MARKET_OPEN.split(':'))
+    
+    next_open = now_pk.replace(hour=open_hour, minute=open_minute, second=0, microsecond=0)
+    if next_open <= now_pk:
+        next_open += timedelta(days=1)
+    
+    # Skip weekends
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    
+    return next_open
+
 def run_scraper():
     """Main scraping function to be scheduled"""
     if not is_market_open():
         logger.info("Market is closed. Skipping scrape.")
         return
     
-    driver = None
     scrape_timestamp = datetime.now(PAKISTAN_TIMEZONE)
     
     logger.info(f"Starting scrape at {scrape_timestamp}")
     
     try:
-        driver = setup_driver()
-        stocks_data = extract_correct_psx_data(driver)
+        stocks_data = fetch_via_http()
+        
+        if not stocks_data:
+            logger.warning("HTTP extraction returned no data, falling back to browser...")
+            driver = get_driver()
+            stocks_data = extract_correct_psx_data(driver)
+            
+            # The extractors swallow browser errors, so an empty result may
+            # mean a dead session; start a fresh browser next cycle
+            if not stocks_data:
+                close_driver()
         
         if stocks_data and len(stocks_data) > 0:
             logger.info(f"Extracted {len(stocks_data)} stocks")
             
-            # Save to PostgreSQL
-            success = save_to_postgresql(stocks_data, scrape_timestamp)
-            
-            if success:
-                logger.info(f"✓ Scrape completed successfully at {scrape_timestamp}")
-                
-                # Display sample data
-                logger.info("Sample data (first 3 stocks):")
-                for i in range(min(3, len(stocks_data))):
-                    stock = stocks_data[i]
-                    logger.info(f"  {stock['symbol']}: {stock['current']} ({stock['change_percent']}%)")
-            else:
-                logger.error("Failed to save data to database")
+            # Hand off to the database writer; blocks only if it is far behind
+            start_db_writer()
+            DB_WRITE_QUEUE.put((stocks_data, scrape_timestamp))
         else:
             logger.warning("No data extracted")
             
+    except WebDriverException as e:
+        # Browser is likely unusable; start a fresh one next cycle
+        logger.error(f"Browser error: {e}")
+        close_driver()
+        
     except Exception as e:
         logger.error(f"Scraping error: {e}")
-        
-    finally:
-        if driver:
-            try:
-                driver.quit()
-                logger.info("Browser closed")
-            except Exception:
-                pass
 
 def schedule_scraper():
     """Schedule the scraper to run every 5 minutes during market hours"""
@@ -501,65 +705,55 @@ def schedule_scraper():
     logger.info("Data Storage: PostgreSQL (Cloud)")
     logger.info("=" * 80)
     
-    # Setup database
+    # Setup database (creates the shared connection pool)
     try:
+        get_db_pool()
         setup_database()
     except Exception as e:
         logger.error(f"Failed to setup database: {e}")
         return
     
-    # Function to run and schedule next
-    def run_and_schedule():
-        run_scraper()
-        
-        if is_market_open():
-            # Schedule next run if market is still open
-            next_time = get_next_scrape_time()
-            wait_seconds = (next_time - datetime.now(PAKISTAN_TIMEZONE)).total_seconds()
+    # Scheduling loop: scrape, then sleep until the next slot
+    try:
+        while True:
+            run_scraper()
             
-            if wait_seconds > 0:
+            if is_market_open():
+                next_time = get_next_scrape_time()
+                wait_seconds = (next_time - datetime.now(PAKISTAN_TIMEZONE)).total_seconds()
                 logger.info(f"Next scrape scheduled at: {next_time.strftime('%H:%M:%S')} PKT")
                 logger.info(f"Waiting {wait_seconds:.0f} seconds...")
-                time.sleep(wait_seconds)
-                run_and_schedule()
             else:
-                # Should not happen, but just in case
-                time.sleep(SCRAPE_INTERVAL_MINUTES * 60)
-                run_and_schedule()
-        else:
-            # Market is closed, wait until next market day
-            logger.info("Market closed for the day. Waiting for next market open...")
-            
-            # Calculate time until next market open
-            now_pk = datetime.now(PAKISTAN_TIMEZONE)
-            tomorrow = now_pk + timedelta(days=1)
+                logger.info("Market closed. Waiting for next market open...")
+                next_time = get_next_market_open()
+                wait_seconds = (next_time - datetime.now(PAKISTAN_TIMEZONE)).total_seconds()
+                logger.info(f"Next market opens at: {next_time.strftime('%Y-%m-%d %H:%M:%S')} PKT")
+                logger.info(f"Waiting {wait_seconds/3600:.1f} hours...")
             
-            # Find next weekday
-            while tomorrow.weekday() >= 5:  # Skip weekends
-                tomorrow += timedelta(days=1)
+            time.sleep(max(0, wait_seconds))
             
-            # Set to market open time
-            open_hour, open_minute = map(int, PSX_MARKET_OPEN.split(':'))
-            next_open = tomorrow.replace(hour=open_hour, minute=open_minute, second=0, microsecond=0)
-            
-            wait_seconds = (next_open - now_pk).total_seconds()
-            logger.info(f"Next market opens at: {next_open.strftime('%Y-%m-%d %H:%M:%S')} PKT")
-            logger.info(f"Waiting {wait_seconds/3600:.1f} hours...")
-            time.sleep(wait_seconds)
-            run_and_schedule()
-    
-    # Start the scheduling loop
-    try:
-        run_and_schedule()
     except KeyboardInterrupt:
         logger.info("Scraper stopped by user")
     except Exception as e:
         logger.error(f"Fatal error in scheduler: {e}")
+    finally:
+        close_driver()
+        # Flush pending batches before closing database connections
+        if drain_db_writer():
+            if PG_POOL is not None:
+                PG_POOL.closeall()
+        else:
+            # The writer may still be mid-statement on a pooled connection
+            logger.warning("Leaving database pool open for the unfinished writer")
 
 def run_once():
     """Run scraper once (for testing or manual runs)"""
     logger.info("Running single scrape...")
-    run_scraper()
+    try:
+        run_scraper()
+        drain_db_writer()
+    finally:
+        close_driver()
 
 if __name__ == "__main__":
     # Check if running in test mode